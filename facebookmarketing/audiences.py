@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import threading
+import time
+from hashlib import sha256
+from uuid import uuid4
+
+from facebookmarketing import exceptions
+
+logger = logging.getLogger(__name__)
+
+ADD = "add"
+REMOVE = "remove"
+
+
+class AudienceCoalescer(object):
+    """Buffers custom audience membership changes and sends them as multi-batch sessions.
+
+    Changes are kept per audience and schema. Only the latest change of each person within a flush
+    window is sent, so an add followed by a remove becomes a single remove. Buffers are flushed every
+    `flush_interval` seconds, or sooner when one of them reaches `batch_size` rows. With a `spill_path`,
+    every pending change is written to that file first and loaded again on start, so a restart does not
+    lose it.
+
+    Args:
+        client (Client): Client with an access token set.
+        batch_size (int, optional): Rows per request, at most 10000. Defaults to 10000.
+        flush_interval (float, optional): Seconds between flushes. Defaults to 5.
+        max_pending (int, optional): Pending changes allowed before add and remove block. Defaults to 100000.
+        block_timeout (float, optional): Seconds add and remove wait for room before raising
+            CoalescerFullError. Defaults to 10. None waits forever.
+        spill_path (str, optional): File where pending changes are kept. Defaults to None.
+        on_error (callable, optional): Called with (audience_id, schema, operation, exception) when a
+            flush fails, after the changes are queued again for a retry after flush_interval. Exceptions
+            it raises are logged. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        client,
+        batch_size: int = 10000,
+        flush_interval: float = 5,
+        max_pending: int = 100000,
+        block_timeout: float = 10,
+        spill_path: str = None,
+        on_error=None,
+    ) -> None:
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+        self.on_error = on_error
+        self._buffers = {}
+        self._pending = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stop = False
+        self._thread = None
+        self._spill = None
+        if spill_path:
+            if os.path.exists(spill_path):
+                with open(spill_path, encoding="utf-8") as f:
+                    for line in f:
+                        change = json.loads(line)
+                        self._apply((change["audience_id"], change["schema"]), change["hash"], change["operation"])
+            self._spill = open(spill_path, "a", encoding="utf-8")
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def add(self, audience_id: str, schema: str, data: list) -> None:
+        """Queues people to be added to an audience.
+
+        Args:
+            audience_id (str): Audience id.
+            schema (str): Specify what type of information you will be providing.
+            data (list): List of data corresponding to the schema.
+
+        Raises:
+            exceptions.CoalescerFullError: There was no room for the changes within block_timeout.
+        """
+        self._enqueue(audience_id, schema, data, ADD)
+
+    def remove(self, audience_id: str, schema: str, data: list) -> None:
+        """Queues people to be removed from an audience.
+
+        Args:
+            audience_id (str): Audience id.
+            schema (str): Specify what type of information you will be providing.
+            data (list): List of data corresponding to the schema.
+
+        Raises:
+            exceptions.CoalescerFullError: There was no room for the changes within block_timeout.
+        """
+        self._enqueue(audience_id, schema, data, REMOVE)
+
+    def start(self) -> None:
+        """Starts flushing in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="facebookmarketing-audiences", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stops the background thread and flushes what is pending. Changes that fail stay in the spill file."""
+        with self._condition:
+            self._stop = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def flush(self) -> bool:
+        """Sends every pending change now.
+
+        Returns:
+            bool: Whether every change was sent.
+        """
+        with self._flush_lock:
+            with self._condition:
+                buffers, self._buffers, self._pending = self._buffers, {}, 0
+
+            failed = {}
+            errors = []
+            sent = False
+            for key, changes in buffers.items():
+                for operation in (ADD, REMOVE):
+                    hashes = [h for h, op in changes.items() if op == operation]
+                    if not hashes:
+                        continue
+                    try:
+                        self._send(key, operation, hashes)
+                        sent = True
+                    except Exception as e:
+                        failed.setdefault(key, {}).update((h, operation) for h in hashes)
+                        errors.append((key[0], key[1], operation, e))
+
+            with self._condition:
+                for key, changes in failed.items():
+                    newer = self._buffers.pop(key, {})
+                    self._pending -= len(newer)
+                    for h, operation in changes.items():
+                        self._apply(key, h, operation)
+                    for h, operation in newer.items():
+                        self._apply(key, h, operation)
+                try:
+                    if sent:
+                        self._rewrite_spill()
+                finally:
+                    self._condition.notify_all()
+
+            for error in errors:
+                if self.on_error:
+                    try:
+                        self.on_error(*error)
+                    except Exception:
+                        logger.exception("on_error failed for audience %s", error[0])
+            return not failed
+
+    def _enqueue(self, audience_id: str, schema: str, data: list, operation: str) -> None:
+        key = (audience_id, schema)
+        hashes = [sha256(i.encode("utf-8")).hexdigest() for i in data]
+        with self._condition:
+            deadline = None if self.block_timeout is None else time.monotonic() + self.block_timeout
+            while self._pending + len(hashes) > self.max_pending and self._pending > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise exceptions.CoalescerFullError("{} audience changes are pending".format(self._pending))
+                self._waiting += 1
+                self._condition.notify_all()
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            for h in hashes:
+                self._apply(key, h, operation)
+                self._write_spill(key, h, operation)
+            if self._spill is not None:
+                self._spill.flush()
+            if len(self._buffers.get(key, ())) >= self.batch_size:
+                self._condition.notify_all()
+
+    def _apply(self, key: tuple, h: str, operation: str) -> None:
+        changes = self._buffers.setdefault(key, {})
+        if h not in changes:
+            self._pending += 1
+        changes[h] = operation
+
+    def _send(self, key: tuple, operation: str, hashes: list) -> None:
+        audience_id, schema = key
+        method = self.client.add_user_to_audience if operation == ADD else self.client.remove_user_to_audience
+        session_id = int(str(uuid4().int)[:7])
+        batches = [hashes[i : i + self.batch_size] for i in range(0, len(hashes), self.batch_size)]
+        for seq, batch in enumerate(batches, 1):
+            session = {
+                "session_id": session_id,
+                "batch_seq": seq,
+                "last_batch_flag": seq == len(batches),
+                "estimated_num_total": len(hashes),
+            }
+            method(audience_id, schema, batch, session=session, hashed=True)
+
+    def _write_spill(self, key: tuple, h: str, operation: str) -> None:
+        if self._spill is None:
+            return
+        change = {"audience_id": key[0], "schema": key[1], "hash": h, "operation": operation}
+        self._spill.write(json.dumps(change))
+        self._spill.write("\n")
+
+    def _rewrite_spill(self) -> None:
+        if self._spill is None:
+            return
+        tmp_path = self.spill_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for (audience_id, schema), changes in self._buffers.items():
+                for h, operation in changes.items():
+                    change = {"audience_id": audience_id, "schema": schema, "hash": h, "operation": operation}
+                    f.write(json.dumps(change))
+                    f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._spill.close()
+        os.replace(tmp_path, self.spill_path)
+        self._spill = open(self.spill_path, "a", encoding="utf-8")
+
+    def _run(self) -> None:
+        flushed = True
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                # After a failed flush, wait the whole interval even if the buffers are full.
+                while not self._stop and not (flushed and self._is_full()):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._stop:
+                    return
+            try:
+                flushed = self.flush()
+            except Exception:
+                logger.exception("Flushing audience changes failed")
+                flushed = False
+
+    def _is_full(self) -> bool:
+        if self._waiting or self._pending >= self.max_pending:
+            return True
+        return any(len(changes) >= self.batch_size for changes in self._buffers.values())
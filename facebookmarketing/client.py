@@ -1,14 +1,18 @@
 import hashlib
 import hmac
+import threading
+from contextlib import contextmanager
+from functools import partial
 from hashlib import sha256
 from urllib.parse import urlencode, urlparse
 from uuid import uuid4
 
-import requests
-
 from facebookmarketing import exceptions
+from facebookmarketing.deadline import Deadline
 from facebookmarketing.decorators import access_token_required
 from facebookmarketing.enumerators import ErrorEnum
+from facebookmarketing.hedging import HedgePolicy
+from facebookmarketing.transport import RequestsTransport, Transport
 
 
 class Client(object):
@@ -22,6 +26,9 @@ class Client(object):
         requests_hooks: dict = None,
         paginate: bool = True,
         limit: int = 100,
+        timeout: tuple = (10, 60),
+        hedge_policy: HedgePolicy = None,
+        transport: Transport = None,
     ) -> None:
         self.app_id = app_id
         self.app_secret = app_secret
@@ -31,6 +38,10 @@ class Client(object):
         self.access_token = None
         self.paginate = paginate
         self.limit = limit
+        self.timeout = timeout
+        self.hedge_policy = hedge_policy
+        self.transport = transport or RequestsTransport()
+        self._local = threading.local()
         self.BASE_URL += self.version
         if requests_hooks and not isinstance(requests_hooks, dict):
             raise Exception(
@@ -38,6 +49,12 @@ class Client(object):
             )
         self.requests_hooks = requests_hooks
 
+    def close(self) -> None:
+        """Releases the threads of the hedge policy and the connections of the transport."""
+        if self.hedge_policy is not None:
+            self.hedge_policy.shutdown()
+        self.transport.close()
+
     def set_access_token(self, token: str) -> None:
         """Sets the User Access Token for its use in this library.
 
@@ -46,6 +63,37 @@ class Client(object):
         """
         self.access_token = token
 
+    @contextmanager
+    def deadline(self, seconds):
+        """Sets a time budget for every call made inside the block, including all its pages.
+
+        Each request gets its timeout capped to the time left. When the budget runs out while
+        following pages, the pages fetched so far are returned with "deadline_exceeded" set to True,
+        and response["paging"]["cursors"]["after"] can be used to resume. Nested blocks keep the
+        earliest deadline. The deadline is kept per thread; pass `current_deadline` to this method
+        in worker threads to carry it over.
+
+        Args:
+            seconds (float or Deadline): Time budget in seconds, or an existing deadline.
+
+        Yields:
+            Deadline: The active deadline.
+        """
+        previous = self._get_deadline()
+        deadline = seconds if isinstance(seconds, Deadline) else Deadline(seconds)
+        if previous is not None and previous.expires_at < deadline.expires_at:
+            deadline = previous
+        self._local.deadline = deadline
+        try:
+            yield deadline
+        finally:
+            self._local.deadline = previous
+
+    @property
+    def current_deadline(self) -> Deadline:
+        """The deadline active in the current thread, or None."""
+        return self._get_deadline()
+
     def get_app_token(self) -> dict:
         """Generates an Application Token.
 
@@ -100,7 +148,7 @@ class Client(object):
             "client_secret": self.app_secret,
             "code": code,
         }
-        return self._get("/oauth/access_token", params=params)
+        return self._get("/oauth/access_token", params=params, hedge=False)
 
     def extend_token(self, token: str) -> dict:
         """Extends a short-lived User Token for a long-lived User Token.
@@ -275,18 +323,21 @@ class Client(object):
         return self._delete("/{}/subscriptions".format(self.app_id), params=params)
 
     @access_token_required
-    def get_ad_account_leadgen_forms(self, page_id: str, page_access_token: str = None) -> dict:
+    def get_ad_account_leadgen_forms(self, page_id: str, page_access_token: str = None, fields: list = None) -> dict:
         """Gets the forms for the given page.
 
         Args:
             page_id (str): A string with Page's ID.
             page_access_token (str, optional): Page Access Token. Defaults to None.
+            fields (list, optional): Fields to include in the response, e.g. ["id", "name", "questions"]. Defaults to None.
 
         Returns:
             dict: Graph API Response.
         """
         params = self._get_params(token=page_access_token)
         params["limit"] = self.limit
+        if fields and isinstance(fields, list):
+            params["fields"] = ",".join(fields)
         return self._get("/{}/leadgen_forms".format(page_id), params=params)
 
     @access_token_required
@@ -319,17 +370,29 @@ class Client(object):
         Returns:
             dict: Graph API Response.
         """
-        params = self._get_params()
-        if from_date:
-            params["from_date"] = from_date
-        if to_date:
-            params["to_date"] = to_date
-        if after:
-            params["after"] = after
-        if fields:
-            params["fields"] = ",".join(fields)
+        params = self._get_ad_leads_params(from_date, to_date, after, fields)
         return self._get("/{}/leads".format(leadgen_form_id), params=params)
 
+    @access_token_required
+    def iter_ad_leads(
+        self, leadgen_form_id: str, from_date: str = None, to_date: str = None, after: str = None, fields: list = None
+    ):
+        """Gets the leads for the given form one page at a time.
+
+        Args:
+            leadgen_form_id (str): A string with the Form's ID.
+            from_date (str, optional): A timestamp. Defaults to None.
+            to_date (str, optional): A timestamp. Defaults to None.
+            after (str, optional): A cursor. Defaults to None.
+            fields (list, optional): Fields to include in the response. Defaults to None.
+
+        Yields:
+            dict: Graph API Response for each page.
+        """
+        params = self._get_ad_leads_params(from_date, to_date, after, fields)
+        params["limit"] = self.limit
+        return self._iter_pages("/{}/leads".format(leadgen_form_id), params=params)
+
     def get_custom_audience(self, account_id: str, fields: list = None) -> dict:
         """Retrieve a custom audience data.
 
@@ -383,7 +446,9 @@ class Client(object):
         }
         return self._post("/{}/customaudiences".format(account_id), params=params, json=json)
 
-    def add_user_to_audience(self, audience_id: str, schema: str, data: list) -> dict:
+    def add_user_to_audience(
+        self, audience_id: str, schema: str, data: list, session: dict = None, hashed: bool = False
+    ) -> dict:
         """Add people to your ad's audience with a hash of data from your business.
 
         https://developers.facebook.com/docs/marketing-api/reference/custom-audience/users/
@@ -392,23 +457,21 @@ class Client(object):
             audience_id (str): Audience id.
             schema (str): Specify what type of information you will be providing.
             data (list): List of data corresponding to the schema.
+            session (dict, optional): Session to send the data as one batch of a multi-batch upload,
+                with session_id, batch_seq, last_batch_flag and estimated_num_total. Defaults to None,
+                which sends the data as a single batch.
+            hashed (bool, optional): Whether data is already SHA256 hashed. Defaults to False.
 
         Returns:
             dict: Graph API Response.
         """
         params = self._get_params()
-        json = {
-            "session": {
-                "session_id": int(str(uuid4().int)[:7]),
-                "batch_seq": 1,
-                "last_batch_flag": True,
-                "estimated_num_total": len(data),
-            },
-            "payload": {"schema": schema, "data": [sha256(i.encode("utf-8")).hexdigest() for i in data]},
-        }
+        json = self._get_audience_users_json(schema, data, session, hashed)
         return self._post("/{}/users".format(audience_id), params=params, json=json)
 
-    def remove_user_to_audience(self, audience_id: str, schema: str, data: list) -> dict:
+    def remove_user_to_audience(
+        self, audience_id: str, schema: str, data: list, session: dict = None, hashed: bool = False
+    ) -> dict:
         """Remove people from your ad's audience with a hash of data from your business.
 
         https://developers.facebook.com/docs/marketing-api/reference/custom-audience/users/
@@ -417,20 +480,16 @@ class Client(object):
             audience_id (str): Audience id.
             schema (str): Specify what type of information you will be providing.
             data (list): List of data corresponding to the schema.
+            session (dict, optional): Session to send the data as one batch of a multi-batch upload,
+                with session_id, batch_seq, last_batch_flag and estimated_num_total. Defaults to None,
+                which sends the data as a single batch.
+            hashed (bool, optional): Whether data is already SHA256 hashed. Defaults to False.
 
         Returns:
             dict: Graph API Response.
         """
         params = self._get_params()
-        json = {
-            "session": {
-                "session_id": int(str(uuid4().int)[:7]),
-                "batch_seq": 1,
-                "last_batch_flag": True,
-                "estimated_num_total": len(data),
-            },
-            "payload": {"schema": schema, "data": [sha256(i.encode("utf-8")).hexdigest() for i in data]},
-        }
+        json = self._get_audience_users_json(schema, data, session, hashed)
         return self._delete("/{}/users".format(audience_id), params=params, json=json)
 
     def get_adaccounts(self, fields: list = None) -> dict:
@@ -477,6 +536,22 @@ class Client(object):
             params["fields"] = ",".join(fields)
         return self._get("/{}/media".format(page_id), params=params)
 
+    def iter_instagram_media(self, page_id: str, fields: list = None):
+        """Gets the media of an Instagram account one page at a time.
+
+        Args:
+            page_id (str): Instagram Business Account ID.
+            fields (list, optional): Fields to include in the response. Defaults to None.
+
+        Yields:
+            dict: Graph API Response for each page.
+        """
+        params = self._get_params()
+        params["limit"] = self.limit
+        if fields and isinstance(fields, list):
+            params["fields"] = ",".join(fields)
+        return self._iter_pages("/{}/media".format(page_id), params=params)
+
     def get_instagram_media_object(self, media_id: str, fields: list = None) -> dict:
         """[summary]
 
@@ -504,6 +579,22 @@ class Client(object):
         params = self._get_params()
         return self._get("/{}/comments".format(media_id), params=params)
 
+    def iter_instagram_media_comment(self, media_id: str, fields: list = None):
+        """Gets the comments of a media one page at a time.
+
+        Args:
+            media_id (str): Media ID.
+            fields (list, optional): Fields to include in the response. Defaults to None.
+
+        Yields:
+            dict: Graph API Response for each page.
+        """
+        params = self._get_params()
+        params["limit"] = self.limit
+        if fields and isinstance(fields, list):
+            params["fields"] = ",".join(fields)
+        return self._iter_pages("/{}/comments".format(media_id), params=params)
+
     def get_instagram_hashtag(self, page_id: str, fields: list = None) -> dict:
         """[summary]
 
@@ -566,6 +657,24 @@ class Client(object):
             params["fields"] = ",".join(fields)
         return self._get("/{}/recent_media".format(hashtag_id), params=params)
 
+    def iter_instagram_hashtag_recent_media(self, hashtag_id: str, user_id: str, fields: list = None):
+        """Gets the recent media of a hashtag one page at a time.
+
+        Args:
+            hashtag_id (str): Hashtag ID.
+            user_id (str): Instagram Business Account ID making the query.
+            fields (list, optional): Fields to include in the response. Defaults to None.
+
+        Yields:
+            dict: Graph API Response for each page.
+        """
+        params = self._get_params()
+        params["user_id"] = user_id
+        params["limit"] = self.limit
+        if fields and isinstance(fields, list):
+            params["fields"] = ",".join(fields)
+        return self._iter_pages("/{}/recent_media".format(hashtag_id), params=params)
+
     def get_instagram_hashtag_top_media(self, hashtag_id: str, user_id: str, fields: list = None) -> dict:
         """[summary]
 
@@ -583,6 +692,48 @@ class Client(object):
             params["fields"] = ",".join(fields)
         return self._get("/{}/top_media".format(hashtag_id), params=params)
 
+    def iter_instagram_hashtag_top_media(self, hashtag_id: str, user_id: str, fields: list = None):
+        """Gets the top media of a hashtag one page at a time.
+
+        Args:
+            hashtag_id (str): Hashtag ID.
+            user_id (str): Instagram Business Account ID making the query.
+            fields (list, optional): Fields to include in the response. Defaults to None.
+
+        Yields:
+            dict: Graph API Response for each page.
+        """
+        params = self._get_params()
+        params["user_id"] = user_id
+        params["limit"] = self.limit
+        if fields and isinstance(fields, list):
+            params["fields"] = ",".join(fields)
+        return self._iter_pages("/{}/top_media".format(hashtag_id), params=params)
+
+    def _get_ad_leads_params(self, from_date: str, to_date: str, after: str, fields: list) -> dict:
+        params = self._get_params()
+        if from_date:
+            params["from_date"] = from_date
+        if to_date:
+            params["to_date"] = to_date
+        if after:
+            params["after"] = after
+        if fields:
+            params["fields"] = ",".join(fields)
+        return params
+
+    def _get_audience_users_json(self, schema: str, data: list, session: dict, hashed: bool) -> dict:
+        if session is None:
+            session = {
+                "session_id": int(str(uuid4().int)[:7]),
+                "batch_seq": 1,
+                "last_batch_flag": True,
+                "estimated_num_total": len(data),
+            }
+        if not hashed:
+            data = [sha256(i.encode("utf-8")).hexdigest() for i in data]
+        return {"session": session, "payload": {"schema": schema, "data": data}}
+
     def _get_params(self, token: str = None) -> dict:
         """Sets parameters for requests.
 
@@ -611,6 +762,14 @@ class Client(object):
         h = hmac.new(key, msg=msg, digestmod=hashlib.sha256)
         return h.hexdigest()
 
+    def _get_operation(self, endpoint: str) -> str:
+        """Endpoint without its query string and with ids replaced, e.g. /{id}/leads."""
+        path = endpoint.split("?", 1)[0]
+        return "/".join("{id}" if segment.replace("_", "").isdigit() else segment for segment in path.split("/"))
+
+    def _get_deadline(self) -> Deadline:
+        return getattr(self._local, "deadline", None)
+
     def _paginate_response(self, response: dict, **kwargs) -> dict:
         """Cursor-based Pagination
 
@@ -620,7 +779,8 @@ class Client(object):
             response (dict): Graph API Response.
 
         Returns:
-            dict: Graph API Response.
+            dict: Graph API Response. If the active deadline expires, the pages fetched so far
+                with "deadline_exceeded" set to True and the paging of the last fetched page.
         """
         if not self.paginate:
             return response
@@ -629,10 +789,35 @@ class Client(object):
             params = kwargs.get("params", {})
             if "limit" in params:
                 params.pop("limit")
-            response = self._get(response["paging"]["next"].replace(self.BASE_URL, ""), **kwargs)
+            try:
+                next_response = self._request("GET", response["paging"]["next"].replace(self.BASE_URL, ""), **kwargs)
+            except exceptions.DeadlineExceededError:
+                response["deadline_exceeded"] = True
+                return response
+            response = next_response
             response["data"] += data
         return response
 
+    def _iter_pages(self, endpoint, **kwargs):
+        """Cursor-based Pagination, yielding each page as soon as it is fetched.
+
+        https://developers.facebook.com/docs/graph-api/results
+
+        Args:
+            endpoint (str): Graph API endpoint.
+
+        Yields:
+            dict: Graph API Response for each page.
+        """
+        response = self._request("GET", endpoint, **kwargs)
+        yield response
+        params = kwargs.get("params", {})
+        params.pop("limit", None)
+        params.pop("after", None)
+        while "paging" in response and "next" in response["paging"]:
+            response = self._request("GET", response["paging"]["next"].replace(self.BASE_URL, ""), **kwargs)
+            yield response
+
     def _get(self, endpoint, **kwargs):
         return self._paginate_response(self._request("GET", endpoint, **kwargs), **kwargs)
 
@@ -642,13 +827,29 @@ class Client(object):
     def _delete(self, endpoint, **kwargs):
         return self._request("DELETE", endpoint, **kwargs)
 
-    def _request(self, method, endpoint, headers=None, **kwargs):
+    def _request(self, method, endpoint, headers=None, hedge=True, **kwargs):
         _headers = {"Accept": "application/json", "Content-Type": "application/json"}
         if headers:
             _headers.update(headers)
         if self.requests_hooks:
             kwargs.update({"hooks": self.requests_hooks})
-        return self._parse(requests.request(method, self.BASE_URL + endpoint, headers=_headers, **kwargs))
+        timeout = kwargs.pop("timeout", self.timeout)
+        deadline = self._get_deadline()
+        if deadline is not None:
+            if deadline.expired:
+                raise exceptions.DeadlineExceededError("Deadline of {}s exceeded".format(deadline.seconds))
+            timeout = deadline.clamp_timeout(timeout)
+        send = partial(self.transport.send, method, self.BASE_URL + endpoint, headers=_headers, timeout=timeout, **kwargs)
+        try:
+            if self.hedge_policy is not None and hedge and method == "GET":
+                response = self.hedge_policy.run(send, key=self._get_operation(endpoint))
+            else:
+                response = send()
+        except self.transport.timeout_errors:
+            if deadline is not None and deadline.expired:
+                raise exceptions.DeadlineExceededError("Deadline of {}s exceeded".format(deadline.seconds))
+            raise
+        return self._parse(response)
 
     def _parse(self, response):
         if "application/json" in response.headers["Content-Type"]:
@@ -664,31 +865,44 @@ class Client(object):
             error = None
 
         if error:
-            code = error["code"]
-            message = error["message"]
-            try:
-                error_enum = ErrorEnum(code)
-            except Exception:
-                raise exceptions.UnexpectedError("Error: {}. Message {}".format(code, message))
-            if error_enum == ErrorEnum.UnknownError:
-                raise exceptions.UnknownError(message)
-            elif error_enum == ErrorEnum.AppRateLimit:
-                raise exceptions.AppRateLimitError(message)
-            elif error_enum == ErrorEnum.AppPermissionRequired:
-                raise exceptions.AppPermissionRequiredError(message)
-            elif error_enum == ErrorEnum.UserRateLimit:
-                raise exceptions.UserRateLimitError(message)
-            elif error_enum == ErrorEnum.InvalidParameter:
-                raise exceptions.InvalidParameterError(message)
-            elif error_enum == ErrorEnum.SessionKeyInvalid:
-                raise exceptions.SessionKeyInvalidError(message)
-            elif error_enum == ErrorEnum.IncorrectPermission:
-                raise exceptions.IncorrectPermissionError(message)
-            elif error_enum == ErrorEnum.InvalidOauth20AccessToken:
-                raise exceptions.PermissionError(message)
-            elif error_enum == ErrorEnum.ExtendedPermissionRequired:
-                raise exceptions.ExtendedPermissionRequiredError(message)
-            else:
-                raise exceptions.BaseError("Error: {}. Message {}".format(code, message))
+            exception = self._get_error(error)
+            exception.response = r
+            raise exception
 
         return r
+
+    def _get_error(self, error: dict) -> exceptions.BaseError:
+        """Maps a Graph API error to an exception.
+
+        Args:
+            error (dict): Graph API error with code and message.
+
+        Returns:
+            exceptions.BaseError: Exception to raise. The parsed response is set as its response attribute.
+        """
+        code = error["code"]
+        message = error["message"]
+        try:
+            error_enum = ErrorEnum(code)
+        except Exception:
+            return exceptions.UnexpectedError("Error: {}. Message {}".format(code, message))
+        if error_enum == ErrorEnum.UnknownError:
+            return exceptions.UnknownError(message)
+        elif error_enum == ErrorEnum.AppRateLimit:
+            return exceptions.AppRateLimitError(message)
+        elif error_enum == ErrorEnum.AppPermissionRequired:
+            return exceptions.AppPermissionRequiredError(message)
+        elif error_enum == ErrorEnum.UserRateLimit:
+            return exceptions.UserRateLimitError(message)
+        elif error_enum == ErrorEnum.InvalidParameter:
+            return exceptions.InvalidParameterError(message)
+        elif error_enum == ErrorEnum.SessionKeyInvalid:
+            return exceptions.SessionKeyInvalidError(message)
+        elif error_enum == ErrorEnum.IncorrectPermission:
+            return exceptions.IncorrectPermissionError(message)
+        elif error_enum == ErrorEnum.InvalidOauth20AccessToken:
+            return exceptions.PermissionError(message)
+        elif error_enum == ErrorEnum.ExtendedPermissionRequired:
+            return exceptions.ExtendedPermissionRequiredError(message)
+        else:
+            return exceptions.BaseError("Error: {}. Message {}".format(code, message))
@@ -0,0 +1,234 @@
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+MEDIA_FIELDS = ["id", "caption", "media_type", "media_url", "permalink", "timestamp", "comments_count", "like_count"]
+COMMENT_FIELDS = ["id", "text", "timestamp", "username"]
+
+
+class SeenSet(object):
+    """Set of the most recent `maxlen` ids."""
+
+    __slots__ = ("_order", "_ids")
+
+    def __init__(self, maxlen: int) -> None:
+        self._order = deque(maxlen=maxlen)
+        self._ids = set()
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, item_id: str) -> None:
+        if item_id in self._ids:
+            return
+        if len(self._order) == self._order.maxlen:
+            self._ids.discard(self._order[0])
+        self._order.append(item_id)
+        self._ids.add(item_id)
+
+
+class InstagramCrawler(object):
+    """Fetches only the Instagram media and comments that were not seen in previous crawls.
+
+    Hashtag ids are cached because the hashtag search endpoint is limited to 30 hashtags per week.
+    Media and comments are listed newest first, so a listing stops at the first item already seen.
+    Comments are only fetched for media whose comments_count changed since the last crawl. Comment
+    state is kept for the `max_media` most recently crawled media; older media are forgotten.
+    A deadline set with `client.deadline` around a crawl also applies to its worker threads.
+
+    Args:
+        client (Client): Client with an access token set.
+        user_id (str): Instagram Business Account ID making the hashtag queries.
+        max_workers (int, optional): Concurrent requests. Defaults to 8.
+        max_seen (int, optional): Ids remembered per hashtag, account or media. Defaults to 1000.
+        max_media (int, optional): Media whose comment state is remembered. Defaults to 10000.
+        hashtag_ids (dict, optional): Known hashtag name to id mapping, e.g. saved from a previous run.
+            Defaults to None.
+        media_fields (list, optional): Media fields to fetch. Defaults to MEDIA_FIELDS.
+        comment_fields (list, optional): Comment fields to fetch. Defaults to COMMENT_FIELDS.
+    """
+
+    def __init__(
+        self,
+        client,
+        user_id: str,
+        max_workers: int = 8,
+        max_seen: int = 1000,
+        max_media: int = 10000,
+        hashtag_ids: dict = None,
+        media_fields: list = None,
+        comment_fields: list = None,
+    ) -> None:
+        self.client = client
+        self.user_id = user_id
+        self.max_workers = max_workers
+        self.max_seen = max_seen
+        self.max_media = max_media
+        self.hashtag_ids = dict(hashtag_ids or {})
+        self.media_fields = media_fields or MEDIA_FIELDS
+        self.comment_fields = comment_fields or COMMENT_FIELDS
+        self._seen = {}
+        self._media = OrderedDict()
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._hashtag_lock = threading.Lock()
+
+    def get_hashtag_id(self, name: str) -> str:
+        """Gets the id of a hashtag, searching for it only the first time.
+
+        Args:
+            name (str): Hashtag name without #.
+
+        Returns:
+            str: Hashtag id, or None if it does not exist.
+        """
+        name = _normalize_hashtag(name)
+        with self._hashtag_lock:
+            if name not in self.hashtag_ids:
+                response = self.client.get_instagram_hashtag_search(self.user_id, name)
+                self.hashtag_ids[name] = response["data"][0]["id"] if response.get("data") else None
+            return self.hashtag_ids[name]
+
+    def crawl_hashtags(self, names: list, top: bool = False) -> dict:
+        """Gets the media of each hashtag that was not returned by previous crawls.
+
+        Args:
+            names (list): Hashtag names.
+            top (bool, optional): Crawl top media instead of recent media. Top media is not ordered
+                by date, so it is listed in full and only filtered. Defaults to False.
+
+        Returns:
+            dict: New media for each hashtag name, lowercased and without #. Hashtags that failed are
+                left out and their exceptions are in `errors`.
+        """
+        edge = "top_media" if top else "recent_media"
+        list_media = (
+            self.client.iter_instagram_hashtag_top_media if top else self.client.iter_instagram_hashtag_recent_media
+        )
+
+        def crawl(name):
+            hashtag_id = self.get_hashtag_id(name)
+            if hashtag_id is None:
+                return None, []
+            seen = self._get_seen((edge, hashtag_id))
+            pages = list_media(hashtag_id, self.user_id, self.media_fields)
+            return seen, self._new_items(seen, pages, stop_at_seen=not top)
+
+        names = list(OrderedDict.fromkeys(_normalize_hashtag(name) for name in names))
+        return self._crawl(crawl, names, names)
+
+    def crawl_accounts(self, account_ids: list) -> dict:
+        """Gets the media of each Instagram account that was not returned by previous crawls.
+
+        Args:
+            account_ids (list): Instagram Business Account IDs.
+
+        Returns:
+            dict: New media for each account id. Accounts that failed are left out and their
+                exceptions are in `errors`.
+        """
+
+        def crawl(account_id):
+            seen = self._get_seen(("media", account_id))
+            pages = self.client.iter_instagram_media(account_id, self.media_fields)
+            return seen, self._new_items(seen, pages)
+
+        return self._crawl(crawl, account_ids, account_ids)
+
+    def crawl_comments(self, media: list) -> dict:
+        """Gets the new comments of the given media.
+
+        Args:
+            media (list): Media dicts. Those with a comments_count equal to the one seen on the
+                previous crawl are skipped.
+
+        Returns:
+            dict: New comments for each media id that was fetched. Media that failed are left out
+                and their exceptions are in `errors`.
+        """
+        changed = []
+        states = {}
+        for item in media:
+            state = states[item["id"]] = self._get_media_state(item["id"])
+            count = item.get("comments_count")
+            if count is not None and count == state[1]:
+                continue
+            changed.append(item)
+
+        def crawl(item):
+            seen = states[item["id"]][0]
+            pages = self.client.iter_instagram_media_comment(item["id"], self.comment_fields)
+            return seen, self._new_items(seen, pages)
+
+        results = self._crawl(crawl, changed, [item["id"] for item in changed])
+        for item in changed:
+            if item["id"] in results and item.get("comments_count") is not None:
+                states[item["id"]][1] = item["comments_count"]
+        return results
+
+    def _crawl(self, func, items: list, names: list) -> dict:
+        """Runs `func` concurrently and marks the new ids as seen only for the calls that succeeded."""
+        results = {}
+        self.errors = {}
+        for name, (outcome, error) in zip(names, self._map(func, items)):
+            if error is not None:
+                self.errors[name] = error
+                continue
+            seen, new_items = outcome
+            if seen is not None:
+                for item in reversed(new_items):
+                    seen.add(item["id"])
+            results[name] = new_items
+        return results
+
+    def _map(self, func, items: list) -> list:
+        if not items:
+            return []
+        deadline = self.client.current_deadline
+
+        def call(item):
+            try:
+                if deadline is None:
+                    return func(item), None
+                with self.client.deadline(deadline):
+                    return func(item), None
+            except Exception as e:
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(call, items))
+
+    def _get_seen(self, key: tuple) -> SeenSet:
+        with self._lock:
+            return self._seen.setdefault(key, SeenSet(self.max_seen))
+
+    def _get_media_state(self, media_id: str) -> list:
+        """Seen comments and last comments_count of a media, evicting the least recently used media."""
+        with self._lock:
+            state = self._media.pop(media_id, None) or [SeenSet(self.max_seen), None]
+            self._media[media_id] = state
+            while len(self._media) > self.max_media:
+                self._media.popitem(last=False)
+            return state
+
+    def _new_items(self, seen: SeenSet, pages, stop_at_seen: bool = True) -> list:
+        new_items = []
+        for page in pages:
+            reached_seen = False
+            for item in page.get("data", []):
+                if item["id"] in seen:
+                    reached_seen = True
+                    if stop_at_seen:
+                        break
+                    continue
+                new_items.append(item)
+            if reached_seen and stop_at_seen:
+                break
+        return new_items
+
+
+def _normalize_hashtag(name: str) -> str:
+    return name.lstrip("#").lower()
@@ -0,0 +1,37 @@
+import time
+
+
+class Deadline(object):
+    """A point in time after which an operation must stop issuing requests."""
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, never negative.
+
+        Returns:
+            float: Remaining seconds.
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def clamp_timeout(self, timeout):
+        """Caps a requests-style timeout so that no single call outlives the deadline.
+
+        Args:
+            timeout (float or tuple): Either a single value or a (connect, read) tuple. None means no timeout.
+
+        Returns:
+            float or tuple: The timeout capped to the remaining time.
+        """
+        remaining = self.remaining()
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
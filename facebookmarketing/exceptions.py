@@ -52,3 +52,15 @@ class PermissionError(BaseError):
 
 class ExtendedPermissionRequiredError(BaseError):
     pass
+
+
+class DeadlineExceededError(BaseError):
+    pass
+
+
+class ReplayNotFoundError(BaseError):
+    pass
+
+
+class CoalescerFullError(BaseError):
+    pass
@@ -0,0 +1,191 @@
+import csv
+import json
+
+from facebookmarketing import exceptions
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+LEAD_FIELDS = ["id", "created_time", "ad_id", "adset_id", "campaign_id", "form_id", "is_organic", "platform"]
+
+
+def get_form_schemas(client, page_id: str, page_access_token: str = None) -> dict:
+    """Builds the export columns of every lead form of a page from its questions.
+
+    Args:
+        client (Client): Client with an access token set.
+        page_id (str): A string with Page's ID.
+        page_access_token (str, optional): Page Access Token. Defaults to None.
+
+    Returns:
+        dict: Columns for each form, keyed by form id.
+    """
+    response = client.get_ad_account_leadgen_forms(page_id, page_access_token, fields=["id", "questions"])
+    return {form["id"]: form_columns(form) for form in response["data"]}
+
+
+def form_columns(form: dict) -> list:
+    """Columns for the leads of a form: the lead fields followed by the key of each question.
+
+    Args:
+        form (dict): Lead form with its questions.
+
+    Returns:
+        list: Column names.
+    """
+    columns = list(LEAD_FIELDS)
+    for question in form.get("questions", []):
+        if question["key"] not in columns:
+            columns.append(question["key"])
+    return columns
+
+
+def flatten_lead(lead: dict, columns: list = None) -> dict:
+    """Moves the answers in field_data to top-level keys. Multiple values are joined with commas.
+
+    Args:
+        lead (dict): Lead as returned by the Graph API.
+        columns (list, optional): Keys to keep. Defaults to None, which keeps them all.
+
+    Returns:
+        dict: Flat lead.
+    """
+    row = {k: v for k, v in lead.items() if k != "field_data"}
+    for field in lead.get("field_data", []):
+        row[field["name"]] = ",".join(field.get("values", []))
+    if columns is None:
+        return row
+    return {column: row.get(column) for column in columns}
+
+
+def export_leads(
+    client, leadgen_form_id: str, sink, from_date: str = None, to_date: str = None, after: str = None
+) -> dict:
+    """Writes the leads of a form to a sink page by page, so memory use does not grow with the number of leads.
+
+    Args:
+        client (Client): Client with an access token set.
+        leadgen_form_id (str): A string with the Form's ID.
+        sink (NDJSONSink, CSVSink or ParquetSink): Destination of the rows.
+        from_date (str, optional): A timestamp. Defaults to None.
+        to_date (str, optional): A timestamp. Defaults to None.
+        after (str, optional): A cursor to resume from. Defaults to None.
+
+    Returns:
+        dict: Number of leads written and the cursor of the last page. If the client deadline expires,
+            "deadline_exceeded" is set to True and the export can be resumed from "after".
+    """
+    fields = LEAD_FIELDS + ["field_data"]
+    count = 0
+    try:
+        for page in client.iter_ad_leads(leadgen_form_id, from_date, to_date, after, fields):
+            rows = [flatten_lead(lead, sink.columns) for lead in page["data"]]
+            sink.write(rows)
+            count += len(rows)
+            after = page.get("paging", {}).get("cursors", {}).get("after", after)
+    except exceptions.DeadlineExceededError:
+        return {"count": count, "after": after, "deadline_exceeded": True}
+    return {"count": count, "after": after}
+
+
+class NDJSONSink(object):
+    """Writes one JSON object per line.
+
+    Args:
+        path (str): File path.
+        columns (list, optional): Keys to write. Defaults to None, which writes every field.
+    """
+
+    def __init__(self, path: str, columns: list = None) -> None:
+        self.columns = columns
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows: list) -> None:
+        for row in rows:
+            self._file.write(json.dumps(row, ensure_ascii=False))
+            self._file.write("\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CSVSink(object):
+    """Writes rows to a CSV file with a header.
+
+    Args:
+        path (str): File path.
+        columns (list): Column names.
+    """
+
+    def __init__(self, path: str, columns: list) -> None:
+        self.columns = columns
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write(self, rows: list) -> None:
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ParquetSink(object):
+    """Writes rows to a Parquet file of string columns, one row group every `row_group_size` rows.
+
+    Requires pyarrow.
+
+    Args:
+        path (str): File path.
+        columns (list): Column names.
+        row_group_size (int, optional): Rows buffered before a row group is written. Defaults to 10000.
+    """
+
+    def __init__(self, path: str, columns: list, row_group_size: int = 10000) -> None:
+        if pyarrow is None:
+            raise ImportError("ParquetSink requires pyarrow. Install it with: pip install pyarrow")
+        self.columns = columns
+        self.row_group_size = row_group_size
+        self._schema = pyarrow.schema([(column, pyarrow.string()) for column in columns])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        self._rows = []
+
+    def write(self, rows: list) -> None:
+        self._rows.extend(rows)
+        while len(self._rows) >= self.row_group_size:
+            self._write_row_group(self._rows[: self.row_group_size])
+            del self._rows[: self.row_group_size]
+
+    def close(self) -> None:
+        if self._rows:
+            self._write_row_group(self._rows)
+            self._rows = []
+        self._writer.close()
+
+    def _write_row_group(self, rows: list) -> None:
+        arrays = [
+            pyarrow.array([None if row.get(c) is None else str(row.get(c)) for row in rows], pyarrow.string())
+            for c in self.columns
+        ]
+        self._writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self._schema))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
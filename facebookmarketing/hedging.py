@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+
+class HedgePolicy(object):
+    """Sends a duplicate of a slow idempotent request and keeps whichever answers first.
+
+    The hedge delay is the given percentile of the latencies recently observed for the same operation,
+    so slow paginated reads do not raise the delay of quick lookups. Every request earns
+    `budget_ratio` of a hedge token and every hedge spends a whole one, so hedges never add more than
+    that fraction of extra calls against the rate limit.
+
+    Args:
+        percentile (float, optional): Latency percentile used as the hedge delay. Defaults to 95.
+        window (int, optional): Number of recent latencies to keep per operation. Defaults to 200.
+        min_samples (int, optional): Latencies of an operation needed before hedging it. Defaults to 20.
+        min_delay (float, optional): Lower bound for the hedge delay in seconds. Defaults to 0.05.
+        budget_ratio (float, optional): Hedges allowed per request. Defaults to 0.05.
+        max_budget (float, optional): Maximum hedge tokens that can be saved up. Defaults to 10.
+        max_workers (int, optional): Threads used to send hedges. Defaults to 8. The first request of
+            each call runs on its own thread, so this does not limit concurrent requests.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95,
+        window: int = 200,
+        min_samples: int = 20,
+        min_delay: float = 0.05,
+        budget_ratio: float = 0.05,
+        max_budget: float = 10,
+        max_workers: int = 8,
+    ) -> None:
+        if not 0 < percentile <= 100:
+            raise Exception("percentile must be in (0, 100]")
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.budget_ratio = budget_ratio
+        self.max_budget = max_budget
+        self.hedges_sent = 0
+        self.window = window
+        self._latencies = {}
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="facebookmarketing-hedge")
+
+    def delay(self, key: str = None) -> float:
+        """Time to wait for the first request of an operation before hedging it.
+
+        Args:
+            key (str, optional): Operation, e.g. the endpoint. Defaults to None.
+
+        Returns:
+            float: Delay in seconds, or None while there are not enough samples.
+        """
+        with self._lock:
+            latencies = self._latencies.get(key, ())
+            if len(latencies) < self.min_samples:
+                return None
+            latencies = sorted(latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return max(self.min_delay, latencies[index])
+
+    def record(self, seconds: float, key: str = None) -> None:
+        with self._lock:
+            if key not in self._latencies:
+                self._latencies[key] = deque(maxlen=self.window)
+            self._latencies[key].append(seconds)
+
+    def run(self, send, key: str = None):
+        """Calls `send`, hedging it with a second call if the first one is slow.
+
+        Args:
+            send (callable): Function without arguments that performs the request.
+            key (str, optional): Operation whose latencies decide the hedge delay. Defaults to None.
+
+        Returns:
+            The result of the first call that succeeds.
+        """
+        with self._lock:
+            self._tokens = min(self.max_budget, self._tokens + self.budget_ratio)
+        delay = self.delay(key)
+        if delay is None:
+            return self._timed(send, key)
+
+        primary = Future()
+        primary.set_running_or_notify_cancel()
+
+        def run_primary():
+            try:
+                primary.set_result(self._timed(send, key))
+            except BaseException as e:
+                primary.set_exception(e)
+
+        threading.Thread(target=run_primary, name="facebookmarketing-request", daemon=True).start()
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._acquire():
+            return primary.result()
+
+        hedge = self._executor.submit(send)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self.hedges_sent += 1
+            return True
+
+    def _timed(self, send, key: str):
+        start = time.monotonic()
+        result = send()
+        self.record(time.monotonic() - start, key)
+        return result
@@ -0,0 +1,222 @@
+import threading
+import time
+
+from facebookmarketing import exceptions
+
+
+class TokenInfo(object):
+    """Cached introspection of a single access token."""
+
+    __slots__ = (
+        "token",
+        "is_valid",
+        "expires_at",
+        "data_access_expires_at",
+        "scopes",
+        "checked_at",
+        "refreshed_at",
+        "error",
+    )
+
+    def __init__(self, token: str) -> None:
+        self.token = token
+        self.is_valid = None
+        self.expires_at = 0
+        self.data_access_expires_at = 0
+        self.scopes = ()
+        self.checked_at = 0
+        self.refreshed_at = 0
+        self.error = None
+
+    @property
+    def valid_until(self) -> int:
+        """Earliest of the token and data access expiration times, 0 if neither expires.
+
+        Returns:
+            int: Unix timestamp.
+        """
+        expirations = [t for t in (self.expires_at, self.data_access_expires_at) if t]
+        return min(expirations) if expirations else 0
+
+
+class TokenManager(object):
+    """Keeps the access tokens of many tenants inspected and extended ahead of expiry.
+
+    Tokens are looked up from memory; debug_token and token extension run from `check`, which
+    `start` calls periodically in a background thread.
+
+    Args:
+        client (Client): Client used for inspect_token and extend_token.
+        app_token (str): Application Token used to inspect tokens.
+        refresh_before (int, optional): Seconds before expiry at which a token is extended. Defaults to 7 days.
+        max_age (int, optional): Seconds after which an inspection is repeated even if the token
+            has not expired, to catch revoked tokens. Defaults to 1 hour.
+        interval (int, optional): Seconds between background checks. Defaults to 5 minutes.
+        refresh_cooldown (int, optional): Seconds before a token is extended again when the previous
+            extension did not move its expiry out of the refresh window. Defaults to 1 day.
+        on_refresh (callable, optional): Called with (tenant, token) after a token is extended. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        client,
+        app_token: str,
+        refresh_before: int = 7 * 24 * 3600,
+        max_age: int = 3600,
+        interval: int = 300,
+        refresh_cooldown: int = 24 * 3600,
+        on_refresh=None,
+    ) -> None:
+        self.client = client
+        self.app_token = app_token
+        self.refresh_before = refresh_before
+        self.max_age = max_age
+        self.interval = interval
+        self.refresh_cooldown = refresh_cooldown
+        self.on_refresh = on_refresh
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, tenant: str, token: str) -> None:
+        """Registers or replaces the token of a tenant. It is inspected on the next check.
+
+        Args:
+            tenant (str): Tenant identifier.
+            token (str): Access token.
+        """
+        with self._lock:
+            self._tokens[tenant] = TokenInfo(token)
+
+    def remove(self, tenant: str) -> None:
+        with self._lock:
+            self._tokens.pop(tenant, None)
+
+    def get_token(self, tenant: str) -> str:
+        """Returns the current token of a tenant without calling the Graph API.
+
+        Args:
+            tenant (str): Tenant identifier.
+
+        Raises:
+            exceptions.AccessTokenRequired: The tenant has no token.
+            exceptions.InvalidOauth20AccessTokenError: The token is known to be invalid or expired.
+
+        Returns:
+            str: Access token.
+        """
+        info = self._tokens.get(tenant)
+        if info is None:
+            raise exceptions.AccessTokenRequired("No token registered for tenant {}".format(tenant))
+        if info.is_valid is False or (info.valid_until and info.valid_until <= time.time()):
+            raise exceptions.InvalidOauth20AccessTokenError("Token for tenant {} is invalid or expired".format(tenant))
+        return info.token
+
+    def inspect(self, tenant: str) -> TokenInfo:
+        """Returns the token introspection of a tenant, calling debug_token only if the cached one is stale.
+
+        Args:
+            tenant (str): Tenant identifier.
+
+        Raises:
+            exceptions.AccessTokenRequired: The tenant has no token.
+
+        Returns:
+            TokenInfo: Token introspection.
+        """
+        info = self._tokens.get(tenant)
+        if info is None:
+            raise exceptions.AccessTokenRequired("No token registered for tenant {}".format(tenant))
+        if self._is_stale(info, time.time()):
+            self._inspect(info)
+        return info
+
+    def refresh(self, tenant: str) -> str:
+        """Extends the token of a tenant and inspects the new one.
+
+        Args:
+            tenant (str): Tenant identifier.
+
+        Returns:
+            str: The extended token, or None if the tenant was replaced or removed meanwhile.
+        """
+        info = self._tokens[tenant]
+        response = self.client.extend_token(info.token)
+        new_info = TokenInfo(response["access_token"])
+        new_info.refreshed_at = time.time()
+        self._inspect(new_info)
+        with self._lock:
+            stored = self._tokens.get(tenant) is info
+            if stored:
+                self._tokens[tenant] = new_info
+        if not stored:
+            return None
+        if self.on_refresh:
+            self.on_refresh(tenant, new_info.token)
+        return new_info.token
+
+    def check(self) -> None:
+        """Inspects stale tokens and extends the ones close to expiry."""
+        with self._lock:
+            tenants = list(self._tokens.items())
+        for tenant, info in tenants:
+            if self._stop.is_set():
+                return
+            now = time.time()
+            try:
+                if self._is_stale(info, now):
+                    self._inspect(info)
+                if info.refreshed_at and now - info.refreshed_at < self.refresh_cooldown:
+                    continue
+                if info.is_valid and info.expires_at and info.expires_at - now <= self.refresh_before:
+                    self.refresh(tenant)
+            except Exception as e:
+                info.error = e
+
+    def start(self) -> None:
+        """Starts checking tokens in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="facebookmarketing-tokens", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.interval)
+
+    def _is_stale(self, info: TokenInfo, now: float) -> bool:
+        if not info.checked_at:
+            return True
+        if info.is_valid is False:
+            return False
+        if info.valid_until and info.valid_until <= now:
+            return True
+        return now - info.checked_at >= self.max_age
+
+    def _inspect(self, info: TokenInfo) -> None:
+        try:
+            data = self.client.inspect_token(info.token, self.app_token)["data"]
+            error = None
+        except exceptions.BaseError as e:
+            # debug_token reports a bad input token inside data; a top-level error is about the app
+            # token or the request, so it says nothing about this token and the check is retried.
+            data = (getattr(e, "response", None) or {}).get("data")
+            if not isinstance(data, dict) or "error" not in data:
+                raise
+            data = dict(data, is_valid=False)
+            error = e
+        info.is_valid = data.get("is_valid", False)
+        info.expires_at = data.get("expires_at", 0)
+        info.data_access_expires_at = data.get("data_access_expires_at", 0)
+        info.scopes = tuple(data.get("scopes", ()))
+        info.checked_at = time.time()
+        info.error = error
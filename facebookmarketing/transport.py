@@ -0,0 +1,278 @@
+import hashlib
+import json
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from urllib.parse import parse_qsl, urlencode
+
+import requests
+import urllib3
+from requests.structures import CaseInsensitiveDict
+
+from facebookmarketing import exceptions
+
+SECRET_PARAMS = ("access_token", "appsecret_proof", "client_secret", "fb_exchange_token", "input_token", "code")
+# Credentials of the caller, the same for every request. Other secrets select the response, so they are digested.
+CREDENTIAL_PARAMS = ("access_token", "appsecret_proof")
+REDACTED = "REDACTED"
+
+
+class Response(object):
+    """Minimal HTTP response with the interface Client._parse relies on."""
+
+    __slots__ = ("status_code", "headers", "content")
+
+    def __init__(self, status_code: int, headers, content: bytes) -> None:
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Transport(ABC):
+    """Sends HTTP requests for the Client.
+
+    Subclasses implement `send` and list the exceptions they raise on timeouts in `timeout_errors`.
+    """
+
+    timeout_errors = ()
+
+    @abstractmethod
+    def send(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        json=None,
+        data=None,
+        timeout=None,
+        hooks=None,
+    ):
+        """Sends a request.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Full url.
+            headers (dict, optional): Request headers. Defaults to None.
+            params (dict, optional): Query string parameters. Defaults to None.
+            json (optional): Body to send as JSON. Defaults to None.
+            data (optional): Raw body. Defaults to None.
+            timeout (float or tuple, optional): Timeout or (connect, read) timeouts. Defaults to None.
+            hooks (dict, optional): requests event hooks. Defaults to None.
+
+        Returns:
+            An object with headers, text and json() like requests.Response.
+        """
+
+    def close(self) -> None:
+        pass
+
+
+class RequestsTransport(Transport):
+    """Sends requests with the requests library. This is the default transport.
+
+    Args:
+        session (requests.Session, optional): Session to reuse connections. Defaults to None,
+            which opens a new connection for every request.
+    """
+
+    timeout_errors = (requests.exceptions.Timeout,)
+
+    def __init__(self, session: requests.Session = None) -> None:
+        self.session = session
+
+    def send(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        json=None,
+        data=None,
+        timeout=None,
+        hooks=None,
+    ):
+        request = self.session.request if self.session is not None else requests.request
+        return request(
+            method, url, headers=headers, params=params, json=json, data=data, timeout=timeout, hooks=hooks
+        )
+
+    def close(self) -> None:
+        if self.session is not None:
+            self.session.close()
+
+
+class Urllib3Transport(Transport):
+    """Sends requests with a urllib3 connection pool, skipping the requests layer.
+
+    requests event hooks are not supported.
+
+    Args:
+        pool_manager (urllib3.PoolManager, optional): Pool to use. Defaults to None, which creates one.
+    """
+
+    timeout_errors = (urllib3.exceptions.TimeoutError,)
+
+    def __init__(self, pool_manager: urllib3.PoolManager = None) -> None:
+        self.pool_manager = pool_manager or urllib3.PoolManager()
+
+    def send(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        json=None,
+        data=None,
+        timeout=None,
+        hooks=None,
+    ):
+        if hooks:
+            raise Exception("requests_hooks are not supported by Urllib3Transport")
+        if params:
+            query = urlencode([(k, v) for k, v in params.items() if v is not None])
+            url += ("&" if "?" in url else "?") + query
+        body = data
+        if json is not None:
+            body = _dumps(json).encode("utf-8")
+        if isinstance(timeout, tuple):
+            timeout = urllib3.Timeout(connect=timeout[0], read=timeout[1])
+        elif timeout is not None:
+            timeout = urllib3.Timeout(connect=timeout, read=timeout)
+        response = self.pool_manager.request(method, url, body=body, headers=headers, timeout=timeout, retries=False)
+        return Response(response.status, response.headers, response.data)
+
+    def close(self) -> None:
+        self.pool_manager.clear()
+
+
+class RecordReplayTransport(Transport):
+    """Records exchanges to a file, or serves recorded exchanges back without the network.
+
+    Each line of the file is one JSON exchange. Access tokens and other secrets are never written.
+    In the recorded requests, the caller's access_token and appsecret_proof are left out and the other
+    secrets, such as the token given to inspect_token, are replaced by a digest so that requests for
+    different tokens are kept apart. In the responses, secrets are removed from urls, such as paging
+    links, and the values of secret keys, such as the access_token of each page, are replaced by
+    "REDACTED". When replaying, repeated requests get their recorded responses in order; the last one
+    is then served again, so a recording can be replayed in a loop.
+
+    Args:
+        path (str): Recording file.
+        mode (str, optional): "record" or "replay". Defaults to "replay".
+        transport (Transport, optional): Transport used when recording. Defaults to RequestsTransport.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", transport: Transport = None) -> None:
+        if mode not in ("record", "replay"):
+            raise Exception('mode must be "record" or "replay"')
+        self.path = path
+        self.mode = mode
+        self.transport = transport or RequestsTransport()
+        self.timeout_errors = self.transport.timeout_errors
+        self._lock = threading.Lock()
+        self._exchanges = {}
+        if mode == "replay":
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    exchange = json.loads(line)
+                    self._exchanges.setdefault(exchange["key"], deque()).append(exchange)
+            for key, exchanges in self._exchanges.items():
+                self._exchanges[key] = deque(
+                    Response(e["status_code"], CaseInsensitiveDict(e["headers"]), e["body"].encode("utf-8"))
+                    for e in exchanges
+                )
+            self._file = None
+        else:
+            self._file = open(path, "a", encoding="utf-8")
+
+    def send(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        json=None,
+        data=None,
+        timeout=None,
+        hooks=None,
+    ):
+        key = self._key(method, url, params, json, data)
+        if self.mode == "replay":
+            with self._lock:
+                responses = self._exchanges.get(key)
+                if not responses:
+                    raise exceptions.ReplayNotFoundError("No recorded response for {}".format(key))
+                return responses.popleft() if len(responses) > 1 else responses[0]
+
+        response = self.transport.send(method, url, headers, params, json, data, timeout, hooks)
+        exchange = {
+            "key": key,
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "body": _strip_body_secrets(response.text),
+        }
+        with self._lock:
+            self._file.write(_dumps(exchange))
+            self._file.write("\n")
+            self._file.flush()
+        return response
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self.transport.close()
+
+    def _key(self, method: str, url: str, params: dict, json, data) -> str:
+        base, _, query = url.partition("?")
+        items = parse_qsl(query, keep_blank_values=True)
+        if params:
+            items += [(k, str(v)) for k, v in params.items() if v is not None]
+        items = sorted((k, _digest(v) if k in SECRET_PARAMS else v) for k, v in items if k not in CREDENTIAL_PARAMS)
+        key = "{} {}?{}".format(method, base, urlencode(items))
+        if json is not None:
+            key += " " + _dumps(json)
+        elif data is not None:
+            key += " " + str(data)
+        return key
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"))
+
+
+def _digest(value: str) -> str:
+    return "sha256:" + hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+def _strip_url_secrets(url: str) -> str:
+    base, separator, query = url.partition("?")
+    if not separator:
+        return url
+    items = [(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k not in SECRET_PARAMS]
+    return base + ("?" + urlencode(items) if items else "")
+
+
+def _strip_secrets(obj):
+    if isinstance(obj, dict):
+        return {k: REDACTED if k in SECRET_PARAMS else _strip_secrets(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_strip_secrets(v) for v in obj]
+    if isinstance(obj, str) and obj.startswith(("http://", "https://")):
+        return _strip_url_secrets(obj)
+    return obj
+
+
+def _strip_body_secrets(body: str) -> str:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    return json.dumps(_strip_secrets(data), separators=(",", ":"))
@@ -0,0 +1,119 @@
+import os
+import time
+import tempfile
+from hashlib import sha256
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from facebookmarketing import exceptions
+from facebookmarketing.audiences import AudienceCoalescer
+
+
+def hashed(value):
+    return sha256(value.encode("utf-8")).hexdigest()
+
+
+class AudienceCoalescerTestCases(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.spill_path = os.path.join(self.directory.name, "audiences.ndjson")
+        self.client = MagicMock()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_changes_are_coalesced_into_sessions(self):
+        coalescer = AudienceCoalescer(self.client, batch_size=2)
+        coalescer.add("audience", "EMAIL", ["a@example.com", "b@example.com"])
+        coalescer.add("audience", "EMAIL", ["c@example.com"])
+        coalescer.remove("audience", "EMAIL", ["d@example.com"])
+        coalescer.flush()
+        calls = self.client.add_user_to_audience.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0].args, ("audience", "EMAIL", [hashed("a@example.com"), hashed("b@example.com")]))
+        first, last = calls[0].kwargs["session"], calls[1].kwargs["session"]
+        self.assertEqual(first["session_id"], last["session_id"])
+        self.assertEqual((first["batch_seq"], first["last_batch_flag"]), (1, False))
+        self.assertEqual((last["batch_seq"], last["last_batch_flag"], last["estimated_num_total"]), (2, True, 3))
+        self.assertTrue(calls[0].kwargs["hashed"])
+        self.client.remove_user_to_audience.assert_called_once()
+        self.assertEqual(coalescer.pending, 0)
+
+    def test_latest_change_wins(self):
+        coalescer = AudienceCoalescer(self.client)
+        coalescer.add("audience", "EMAIL", ["a@example.com"])
+        coalescer.flush()
+        coalescer.add("audience", "EMAIL", ["a@example.com"])
+        coalescer.remove("audience", "EMAIL", ["a@example.com"])
+        self.assertEqual(coalescer.pending, 1)
+        coalescer.flush()
+        self.client.add_user_to_audience.assert_called_once()
+        self.client.remove_user_to_audience.assert_called_once()
+        self.assertEqual(self.client.remove_user_to_audience.call_args.args[2], [hashed("a@example.com")])
+
+    def test_failed_flush_waits_before_retrying(self):
+        self.client.add_user_to_audience.side_effect = Exception("network down")
+        coalescer = AudienceCoalescer(self.client, max_pending=1, flush_interval=5, spill_path=self.spill_path)
+        coalescer.add("audience", "EMAIL", ["a@example.com"])
+        coalescer.start()
+        time.sleep(0.2)
+        self.assertEqual(self.client.add_user_to_audience.call_count, 1)
+        coalescer.close()
+        self.assertEqual(coalescer.pending, 1)
+
+    def test_backpressure(self):
+        coalescer = AudienceCoalescer(self.client, max_pending=1, block_timeout=0)
+        coalescer.add("audience", "EMAIL", ["a@example.com"])
+        with self.assertRaises(exceptions.CoalescerFullError):
+            coalescer.add("audience", "EMAIL", ["b@example.com"])
+
+    def test_pending_changes_survive_restart(self):
+        self.client.add_user_to_audience.side_effect = Exception("network down")
+        on_error = MagicMock()
+        coalescer = AudienceCoalescer(self.client, spill_path=self.spill_path, on_error=on_error)
+        coalescer.add("audience", "EMAIL", ["a@example.com"])
+        coalescer.close()
+        on_error.assert_called_once()
+
+        self.client.add_user_to_audience.side_effect = None
+        coalescer = AudienceCoalescer(self.client, spill_path=self.spill_path)
+        self.assertEqual(coalescer.pending, 1)
+        coalescer.close()
+        self.assertEqual(self.client.add_user_to_audience.call_args.args[2], [hashed("a@example.com")])
+        self.assertEqual(os.path.getsize(self.spill_path), 0)
+
+    def test_failing_on_error_keeps_changes(self):
+        self.client.add_user_to_audience.side_effect = Exception("network down")
+        on_error = MagicMock(side_effect=Exception("callback bug"))
+        coalescer = AudienceCoalescer(self.client, flush_interval=0.01, on_error=on_error)
+        coalescer.add("audience", "EMAIL", ["a@example.com"])
+        with self.assertLogs("facebookmarketing.audiences"):
+            self.assertFalse(coalescer.flush())
+        self.assertEqual(coalescer.pending, 1)
+
+        with self.assertLogs("facebookmarketing.audiences"):
+            coalescer.start()
+            time.sleep(0.1)
+        self.assertTrue(coalescer._thread.is_alive())
+        self.client.add_user_to_audience.side_effect = None
+        coalescer.close()
+        self.assertEqual(coalescer.pending, 0)
+
+    def test_background_thread_survives_spill_errors(self):
+        coalescer = AudienceCoalescer(self.client, flush_interval=0.01, spill_path=self.spill_path)
+        coalescer._rewrite_spill = MagicMock(side_effect=OSError("disk full"))
+        coalescer.add("audience", "EMAIL", ["a@example.com"])
+        with self.assertLogs("facebookmarketing.audiences"):
+            coalescer.start()
+            time.sleep(0.1)
+        self.assertTrue(coalescer._thread.is_alive())
+        coalescer._rewrite_spill = MagicMock()
+        coalescer.close()
+        self.client.add_user_to_audience.assert_called_once()
+
+    def test_background_flush(self):
+        coalescer = AudienceCoalescer(self.client, flush_interval=0.01)
+        coalescer.start()
+        coalescer.add("audience", "EMAIL", ["a@example.com"])
+        coalescer.close()
+        self.client.add_user_to_audience.assert_called_once()
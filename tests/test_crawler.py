@@ -0,0 +1,89 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from facebookmarketing.client import Client
+from facebookmarketing.crawler import InstagramCrawler, SeenSet
+
+
+class InstagramCrawlerTestCases(TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.current_deadline = None
+        self.client.get_instagram_hashtag_search.return_value = {"data": [{"id": "h1"}]}
+        self.crawler = InstagramCrawler(self.client, "user")
+
+    def pages(self, *pages):
+        def iter_pages(*args):
+            return iter([{"data": page} for page in pages])
+
+        self.client.iter_instagram_hashtag_recent_media.side_effect = iter_pages
+        self.client.iter_instagram_media.side_effect = iter_pages
+        self.client.iter_instagram_media_comment.side_effect = iter_pages
+
+    def test_hashtag_id_is_cached(self):
+        self.assertEqual(self.crawler.get_hashtag_id("#Coke"), "h1")
+        self.assertEqual(self.crawler.get_hashtag_id("coke"), "h1")
+        self.client.get_instagram_hashtag_search.assert_called_once_with("user", "coke")
+
+    def test_crawl_stops_at_seen_media(self):
+        self.pages([{"id": "2"}, {"id": "1"}])
+        self.assertEqual(self.crawler.crawl_hashtags(["coke"]), {"coke": [{"id": "2"}, {"id": "1"}]})
+        self.pages([{"id": "3"}, {"id": "2"}], [{"id": "1"}])
+        self.assertEqual(self.crawler.crawl_hashtags(["coke"]), {"coke": [{"id": "3"}]})
+        self.assertEqual(self.client.iter_instagram_hashtag_recent_media.call_args.args[:2], ("h1", "user"))
+
+    def test_failed_crawl_does_not_lose_other_results(self):
+        self.client.get_instagram_hashtag_search.side_effect = lambda user_id, name: {"data": [{"id": name}]}
+
+        def iter_pages(hashtag_id, user_id, fields):
+            if hashtag_id == "bad":
+                raise Exception("rate limited")
+            return iter([{"data": [{"id": "1"}]}])
+
+        self.client.iter_instagram_hashtag_recent_media.side_effect = iter_pages
+        self.assertEqual(self.crawler.crawl_hashtags(["good", "bad"]), {"good": [{"id": "1"}]})
+        self.assertIn("bad", self.crawler.errors)
+        self.assertEqual(self.crawler.crawl_hashtags(["good"]), {"good": []})
+
+    def test_deadline_reaches_workers(self):
+        client = Client("app_id", "app_secret", "v12.0")
+        crawler = InstagramCrawler(client, "user")
+        deadlines = []
+
+        def crawl(item):
+            deadlines.append(client.current_deadline)
+            return None, []
+
+        with client.deadline(30) as deadline:
+            crawler._crawl(crawl, ["a", "b"], ["a", "b"])
+        self.assertEqual(deadlines, [deadline, deadline])
+
+    def test_comments_only_for_changed_media(self):
+        self.pages([{"id": "c1"}])
+        media = [{"id": "m1", "comments_count": 1}]
+        self.assertEqual(self.crawler.crawl_comments(media), {"m1": [{"id": "c1"}]})
+        self.assertEqual(self.crawler.crawl_comments(media), {})
+        self.pages([{"id": "c2"}, {"id": "c1"}])
+        self.assertEqual(self.crawler.crawl_comments([{"id": "m1", "comments_count": 2}]), {"m1": [{"id": "c2"}]})
+
+    def test_seen_set_is_bounded(self):
+        seen = SeenSet(2)
+        for item_id in ("1", "2", "3"):
+            seen.add(item_id)
+        self.assertNotIn("1", seen)
+        self.assertIn("3", seen)
+        self.assertEqual(len(seen), 2)
+
+    def test_hashtag_names_are_deduplicated(self):
+        self.pages([{"id": "1"}])
+        self.assertEqual(self.crawler.crawl_hashtags(["#Coke", "coke"]), {"coke": [{"id": "1"}]})
+        self.client.get_instagram_hashtag_search.assert_called_once_with("user", "coke")
+        self.client.iter_instagram_hashtag_recent_media.assert_called_once()
+
+    def test_media_state_is_bounded(self):
+        crawler = InstagramCrawler(self.client, "user", max_media=2)
+        self.client.iter_instagram_media_comment.side_effect = lambda *args: iter([{"data": [{"id": "c"}]}])
+        crawler.crawl_comments([{"id": "m1", "comments_count": 1}, {"id": "m2", "comments_count": 1}])
+        crawler.crawl_comments([{"id": "m1", "comments_count": 1}, {"id": "m3", "comments_count": 1}])
+        self.assertEqual(list(crawler._media), ["m1", "m3"])
+        self.assertEqual(crawler.crawl_comments([{"id": "m1", "comments_count": 1}]), {})
@@ -0,0 +1,86 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from facebookmarketing import exceptions
+from facebookmarketing.client import Client
+from facebookmarketing.deadline import Deadline
+
+
+def make_response(payload):
+    response = MagicMock()
+    response.headers = {"Content-Type": "application/json"}
+    response.json.return_value = payload
+    return response
+
+
+def make_page(data, after, has_next=True):
+    paging = {"cursors": {"before": "b", "after": after}}
+    if has_next:
+        paging["next"] = Client.BASE_URL + "v12.0/form/leads?after=" + after
+    return {"data": data, "paging": paging}
+
+
+class DeadlineTestCases(TestCase):
+    def setUp(self):
+        self.client = Client("app_id", "app_secret", "v12.0", timeout=(5, 30))
+        self.client.set_access_token("token")
+
+    def test_clamp_timeout(self):
+        deadline = Deadline(2)
+        connect, read = deadline.clamp_timeout((5, 30))
+        self.assertLessEqual(connect, 2)
+        self.assertLessEqual(read, 2)
+        self.assertLessEqual(deadline.clamp_timeout(None), 2)
+        self.assertEqual(Deadline(100).clamp_timeout(1), 1)
+
+    @patch("facebookmarketing.transport.requests.request")
+    def test_timeout_is_passed(self, request):
+        request.return_value = make_response({"id": "1"})
+        self.client.get_account()
+        self.assertEqual(request.call_args.kwargs["timeout"], (5, 30))
+
+    @patch("facebookmarketing.transport.requests.request")
+    def test_pages_are_followed(self, request):
+        request.side_effect = [
+            make_response(make_page([{"id": "1"}], "c1")),
+            make_response(make_page([{"id": "2"}], "c2", has_next=False)),
+        ]
+        response = self.client.get_ad_leads("form")
+        self.assertEqual(len(response["data"]), 2)
+        self.assertNotIn("deadline_exceeded", response)
+
+    @patch("facebookmarketing.deadline.time.monotonic")
+    @patch("facebookmarketing.transport.requests.request")
+    def test_partial_result_on_deadline(self, request, monotonic):
+        monotonic.return_value = 0
+
+        pages = [make_response(make_page([{"id": "1"}], "c1"))]
+
+        def send(*args, **kwargs):
+            if pages:
+                return pages.pop(0)
+            monotonic.return_value = 10
+            raise requests.exceptions.ReadTimeout()
+
+        request.side_effect = send
+        with self.client.deadline(5):
+            response = self.client.get_ad_leads("form")
+        self.assertTrue(response["deadline_exceeded"])
+        self.assertEqual(response["data"], [{"id": "1"}])
+        self.assertEqual(response["paging"]["cursors"]["after"], "c1")
+
+    @patch("facebookmarketing.transport.requests.request")
+    def test_expired_deadline_raises(self, request):
+        with self.client.deadline(0):
+            with self.assertRaises(exceptions.DeadlineExceededError):
+                self.client.get_account()
+        request.assert_not_called()
+
+    def test_nested_deadline_keeps_earliest(self):
+        with self.client.deadline(1) as outer:
+            with self.client.deadline(100) as inner:
+                self.assertIs(inner, outer)
+            self.assertIs(self.client._get_deadline(), outer)
+        self.assertIsNone(self.client._get_deadline())
@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+import tempfile
+from unittest import TestCase, skipIf
+from unittest.mock import MagicMock, patch
+
+from facebookmarketing import exceptions, export
+from facebookmarketing.client import Client
+from facebookmarketing.export import CSVSink, NDJSONSink, ParquetSink, export_leads, flatten_lead, form_columns
+
+FORM = {"id": "form", "questions": [{"key": "email"}, {"key": "full_name"}]}
+
+
+def lead(lead_id, email):
+    return {
+        "id": lead_id,
+        "created_time": "2021-01-01T00:00:00+0000",
+        "field_data": [{"name": "email", "values": [email]}, {"name": "full_name", "values": ["Jane", "Doe"]}],
+    }
+
+
+class ExportTestCases(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.client = MagicMock()
+        self.client.iter_ad_leads.return_value = iter(
+            [
+                {"data": [lead("1", "a@example.com")], "paging": {"cursors": {"after": "c1"}}},
+                {"data": [lead("2", "b@example.com")], "paging": {"cursors": {"after": "c2"}}},
+            ]
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_flatten_lead(self):
+        row = flatten_lead(lead("1", "a@example.com"), form_columns(FORM))
+        self.assertEqual(row["email"], "a@example.com")
+        self.assertEqual(row["full_name"], "Jane,Doe")
+        self.assertIsNone(row["ad_id"])
+        self.assertNotIn("field_data", row)
+
+    def test_export_csv(self):
+        with CSVSink(self.path("leads.csv"), form_columns(FORM)) as sink:
+            result = export_leads(self.client, "form", sink)
+        self.assertEqual(result, {"count": 2, "after": "c2"})
+        with open(self.path("leads.csv"), encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([r["email"] for r in rows], ["a@example.com", "b@example.com"])
+
+    def test_export_returns_cursor_on_deadline(self):
+        def pages():
+            yield {"data": [lead("1", "a@example.com")], "paging": {"cursors": {"after": "c1"}}}
+            raise exceptions.DeadlineExceededError("Deadline of 5s exceeded")
+
+        self.client.iter_ad_leads.return_value = pages()
+        with NDJSONSink(self.path("leads.ndjson")) as sink:
+            result = export_leads(self.client, "form", sink)
+        self.assertEqual(result, {"count": 1, "after": "c1", "deadline_exceeded": True})
+
+    def test_export_ndjson(self):
+        with NDJSONSink(self.path("leads.ndjson")) as sink:
+            export_leads(self.client, "form", sink)
+        with open(self.path("leads.ndjson"), encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(rows[1]["id"], "2")
+        self.assertEqual(rows[1]["email"], "b@example.com")
+
+    @skipIf(export.pyarrow is None, "pyarrow is not installed")
+    def test_export_parquet(self):
+        with ParquetSink(self.path("leads.parquet"), form_columns(FORM), row_group_size=1) as sink:
+            export_leads(self.client, "form", sink)
+        table = export.pyarrow.parquet.read_table(self.path("leads.parquet"))
+        self.assertEqual(table.column("email").to_pylist(), ["a@example.com", "b@example.com"])
+
+    @patch("facebookmarketing.transport.requests.request")
+    def test_iter_ad_leads_yields_pages(self, request):
+        pages = [
+            {"data": [lead("1", "a@example.com")], "paging": {"next": Client.BASE_URL + "v12.0/form/leads?after=c1"}},
+            {"data": [lead("2", "b@example.com")], "paging": {"cursors": {"after": "c2"}}},
+        ]
+        responses = []
+        for page in pages:
+            response = MagicMock()
+            response.headers = {"Content-Type": "application/json"}
+            response.json.return_value = page
+            responses.append(response)
+        request.side_effect = responses
+        client = Client("app_id", "app_secret", "v12.0")
+        client.set_access_token("token")
+        result = [page["data"][0]["id"] for page in client.iter_ad_leads("form", after="c0")]
+        self.assertEqual(result, ["1", "2"])
+        self.assertEqual(request.call_args_list[0].args[1], client.BASE_URL + "/form/leads")
+        self.assertEqual(request.call_args_list[1].args[1], client.BASE_URL + "/form/leads?after=c1")
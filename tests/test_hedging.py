@@ -0,0 +1,108 @@
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from facebookmarketing.client import Client
+from facebookmarketing.hedging import HedgePolicy
+
+
+class HedgePolicyTestCases(TestCase):
+    def setUp(self):
+        self.policy = HedgePolicy(min_samples=5, min_delay=0.01, budget_ratio=1, max_budget=1)
+
+    def tearDown(self):
+        self.policy.shutdown()
+
+    def test_no_delay_without_samples(self):
+        self.assertIsNone(self.policy.delay())
+        for latency in (0.1, 0.2, 0.3, 0.4, 0.5):
+            self.policy.record(latency)
+        self.assertEqual(self.policy.delay(), 0.5)
+
+    def test_hedge_wins_over_stalled_request(self):
+        for _ in range(5):
+            self.policy.record(0.001)
+        release = threading.Event()
+        calls = []
+
+        def send():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(5)
+                return "slow"
+            return "fast"
+
+        self.assertEqual(self.policy.run(send), "fast")
+        self.assertEqual(self.policy.hedges_sent, 1)
+        release.set()
+
+    def test_budget_limits_hedges(self):
+        policy = HedgePolicy(min_samples=1, min_delay=0.01, budget_ratio=0)
+        policy.record(0.001)
+        release = threading.Event()
+
+        def send():
+            release.wait(0.1)
+            return "slow"
+
+        self.assertEqual(policy.run(send), "slow")
+        self.assertEqual(policy.hedges_sent, 0)
+        policy.shutdown()
+
+    @patch("facebookmarketing.transport.requests.request")
+    def test_exchange_code_is_not_hedged(self, request):
+        response = MagicMock()
+        response.headers = {"Content-Type": "application/json"}
+        response.json.return_value = {"access_token": "token"}
+        request.return_value = response
+        policy = MagicMock()
+        client = Client("app_id", "app_secret", hedge_policy=policy)
+        client.exchange_code("https://example.com", "code")
+        policy.run.assert_not_called()
+        client.get_app_token()
+        policy.run.assert_called_once()
+
+    def test_primary_requests_are_not_limited_by_pool(self):
+        policy = HedgePolicy(min_samples=1, min_delay=5, max_workers=1)
+        policy.record(5)
+        release = threading.Event()
+        started = []
+
+        def send():
+            started.append(1)
+            release.wait(5)
+            return "ok"
+
+        threads = [threading.Thread(target=policy.run, args=(send,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for _ in range(100):
+            if len(started) == 3:
+                break
+            release.wait(0.01)
+        self.assertEqual(len(started), 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(policy.hedges_sent, 0)
+        policy.shutdown()
+
+    def test_client_close_shuts_down_policy(self):
+        policy = MagicMock()
+        transport = MagicMock()
+        Client("app_id", "app_secret", hedge_policy=policy, transport=transport).close()
+        policy.shutdown.assert_called_once()
+        transport.close.assert_called_once()
+
+    def test_latencies_are_kept_per_operation(self):
+        for _ in range(5):
+            self.policy.record(2, "/{id}/leads")
+            self.policy.record(0.1, "/{id}")
+        self.assertEqual(self.policy.delay("/{id}"), 0.1)
+        self.assertEqual(self.policy.delay("/{id}/leads"), 2)
+        self.assertIsNone(self.policy.delay("/debug_token"))
+
+    def test_client_operation_key(self):
+        client = Client("app_id", "app_secret")
+        self.assertEqual(client._get_operation("/123_456/leads?after=c1&limit=25"), "/{id}/leads")
+        self.assertEqual(client._get_operation("/debug_token"), "/debug_token")
@@ -0,0 +1,117 @@
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from facebookmarketing import exceptions
+from facebookmarketing.client import Client
+from facebookmarketing.tokens import TokenManager
+
+
+def debug_token(expires_in, is_valid=True):
+    return {
+        "data": {
+            "is_valid": is_valid,
+            "expires_at": int(time.time()) + expires_in,
+            "data_access_expires_at": int(time.time()) + 90 * 24 * 3600,
+            "scopes": ["leads_retrieval"],
+        }
+    }
+
+
+class TokenManagerTestCases(TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.manager = TokenManager(self.client, "app_token", refresh_before=3600)
+
+    def test_get_token_does_not_call_api(self):
+        self.manager.add("tenant", "token")
+        self.assertEqual(self.manager.get_token("tenant"), "token")
+        self.client.inspect_token.assert_not_called()
+
+    def test_inspect_is_cached(self):
+        self.client.inspect_token.return_value = debug_token(24 * 3600)
+        self.manager.add("tenant", "token")
+        info = self.manager.inspect("tenant")
+        self.manager.inspect("tenant")
+        self.assertTrue(info.is_valid)
+        self.assertEqual(info.scopes, ("leads_retrieval",))
+        self.client.inspect_token.assert_called_once_with("token", "app_token")
+
+    def test_check_extends_tokens_close_to_expiry(self):
+        self.client.inspect_token.side_effect = [debug_token(60), debug_token(60 * 24 * 3600)]
+        self.client.extend_token.return_value = {"access_token": "new_token"}
+        on_refresh = MagicMock()
+        self.manager.on_refresh = on_refresh
+        self.manager.add("tenant", "token")
+        self.manager.check()
+        self.client.extend_token.assert_called_once_with("token")
+        on_refresh.assert_called_once_with("tenant", "new_token")
+        self.assertEqual(self.manager.get_token("tenant"), "new_token")
+
+    def test_invalid_token_raises(self):
+        self.client.inspect_token.return_value = debug_token(24 * 3600, is_valid=False)
+        self.manager.add("tenant", "token")
+        self.manager.check()
+        with self.assertRaises(exceptions.InvalidOauth20AccessTokenError):
+            self.manager.get_token("tenant")
+        with self.assertRaises(exceptions.AccessTokenRequired):
+            self.manager.get_token("other")
+
+    def test_revoked_token_is_marked_invalid(self):
+        error = exceptions.PermissionError("Error validating access token")
+        error.response = {"data": {"error": {"code": 190, "message": "Session has expired"}, "is_valid": False}}
+        self.client.inspect_token.side_effect = error
+        self.manager.max_age = 0
+        self.manager.add("tenant", "token")
+        self.manager.check()
+        self.manager.check()
+        self.assertFalse(self.manager.inspect("tenant").is_valid)
+        self.client.inspect_token.assert_called_once()
+        with self.assertRaises(exceptions.InvalidOauth20AccessTokenError):
+            self.manager.get_token("tenant")
+
+    def test_refresh_cooldown(self):
+        self.client.inspect_token.side_effect = lambda token, app_token: debug_token(60)
+        self.client.extend_token.return_value = {"access_token": "new_token"}
+        self.manager.add("tenant", "token")
+        self.manager.check()
+        self.manager.check()
+        self.client.extend_token.assert_called_once()
+
+    def test_on_refresh_only_when_stored(self):
+        on_refresh = MagicMock()
+        self.manager.on_refresh = on_refresh
+        self.manager.add("tenant", "token")
+        self.client.inspect_token.return_value = debug_token(24 * 3600)
+
+        def extend(token):
+            self.manager.add("tenant", "replaced")
+            return {"access_token": "new_token"}
+
+        self.client.extend_token.side_effect = extend
+        self.assertIsNone(self.manager.refresh("tenant"))
+        on_refresh.assert_not_called()
+        self.assertEqual(self.manager.get_token("tenant"), "replaced")
+
+    def test_app_token_error_does_not_invalidate_tokens(self):
+        error = exceptions.PermissionError("Invalid OAuth access token")
+        error.response = {"error": {"code": 190, "message": "Invalid OAuth access token"}}
+        self.client.inspect_token.side_effect = error
+        self.manager.max_age = 0
+        self.manager.add("tenant", "token")
+        self.manager.check()
+        self.assertIs(self.manager._tokens["tenant"].error, error)
+        self.assertEqual(self.manager.get_token("tenant"), "token")
+        self.client.inspect_token.side_effect = None
+        self.client.inspect_token.return_value = debug_token(24 * 3600)
+        self.manager.check()
+        self.assertEqual(self.client.inspect_token.call_count, 2)
+        self.assertTrue(self.manager.inspect("tenant").is_valid)
+
+    @patch("facebookmarketing.transport.requests.request")
+    def test_client_error_keeps_response(self, request):
+        payload = {"data": {"error": {"code": 190, "message": "Session has expired"}, "is_valid": False}}
+        request.return_value = MagicMock(headers={"Content-Type": "application/json"}, **{"json.return_value": payload})
+        with self.assertRaises(exceptions.PermissionError) as context:
+            Client("app_id", "app_secret").inspect_token("input_token", "app_token")
+        self.assertEqual(context.exception.response, payload)
@@ -0,0 +1,126 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from facebookmarketing import exceptions
+from facebookmarketing.client import Client
+from facebookmarketing.transport import RecordReplayTransport, Response, Urllib3Transport
+
+
+def make_response(body):
+    return Response(200, {"Content-Type": "application/json"}, body.encode("utf-8"))
+
+
+class TransportTestCases(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "exchanges.ndjson")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_record_and_replay(self):
+        inner = MagicMock()
+        inner.timeout_errors = ()
+        inner.send.return_value = make_response('{"id": "1", "name": "Jane"}')
+        recorder = RecordReplayTransport(self.path, mode="record", transport=inner)
+        client = Client("app_id", "app_secret", "v12.0", transport=recorder)
+        client.set_access_token("token")
+        self.assertEqual(client.get_account(), {"id": "1", "name": "Jane"})
+        recorder.close()
+        with open(self.path, encoding="utf-8") as f:
+            self.assertNotIn("token", f.read().replace("access_token", ""))
+
+        client = Client("app_id", "app_secret", "v12.0", transport=RecordReplayTransport(self.path))
+        client.set_access_token("other_token")
+        self.assertEqual(client.get_account(), {"id": "1", "name": "Jane"})
+        self.assertEqual(client.get_account(), {"id": "1", "name": "Jane"})
+        with self.assertRaises(exceptions.ReplayNotFoundError):
+            client.get_pages()
+
+    def test_record_and_replay_paginated(self):
+        next_url = Client.BASE_URL + "v12.0/form/leads?access_token=s3cr3t&appsecret_proof=pr00f&limit=25&after=c1"
+        pages = {
+            Client.BASE_URL + "v12.0/form/leads": '{"data": [{"id": "1"}], "paging": {"next": "%s"}}' % next_url,
+            next_url: '{"data": [{"id": "2"}], "paging": {"cursors": {"after": "c2"}}}',
+        }
+        inner = MagicMock()
+        inner.timeout_errors = ()
+        inner.send.side_effect = lambda method, url, *args: make_response(pages[url])
+        recorder = RecordReplayTransport(self.path, mode="record", transport=inner)
+        client = Client("app_id", "app_secret", "v12.0", transport=recorder)
+        client.set_access_token("s3cr3t")
+        recorded = client.get_ad_leads("form")
+        recorder.close()
+        with open(self.path, encoding="utf-8") as f:
+            content = f.read()
+        self.assertNotIn("s3cr3t", content)
+        self.assertNotIn("pr00f", content)
+
+        client = Client("app_id", "app_secret", "v12.0", transport=RecordReplayTransport(self.path))
+        client.set_access_token("other_token")
+        replayed = client.get_ad_leads("form")
+        self.assertEqual(replayed["data"], recorded["data"])
+        self.assertEqual([lead["id"] for lead in replayed["data"]], ["2", "1"])
+
+    def test_record_redacts_tokens_in_bodies(self):
+        inner = MagicMock()
+        inner.timeout_errors = ()
+        inner.send.return_value = make_response('{"data": [{"id": "1", "access_token": "p4g3"}]}')
+        recorder = RecordReplayTransport(self.path, mode="record", transport=inner)
+        client = Client("app_id", "app_secret", "v12.0", transport=recorder)
+        client.set_access_token("token")
+        self.assertEqual(client.get_pages()["data"][0]["access_token"], "p4g3")
+        recorder.close()
+        with open(self.path, encoding="utf-8") as f:
+            self.assertNotIn("p4g3", f.read())
+
+        client = Client("app_id", "app_secret", "v12.0", transport=RecordReplayTransport(self.path))
+        client.set_access_token("token")
+        self.assertEqual(client.get_pages()["data"], [{"id": "1", "access_token": "REDACTED"}])
+
+    def test_record_keeps_inspected_tokens_apart(self):
+        bodies = {"t0k3nA": '{"data": {"is_valid": true}}', "t0k3nB": '{"data": {"is_valid": false}}'}
+        inner = MagicMock()
+        inner.timeout_errors = ()
+        inner.send.side_effect = lambda method, url, headers, params, *args: make_response(
+            bodies[params["input_token"]]
+        )
+        recorder = RecordReplayTransport(self.path, mode="record", transport=inner)
+        client = Client("app_id", "app_secret", "v12.0", transport=recorder)
+        client.inspect_token("t0k3nA", "app|token")
+        client.inspect_token("t0k3nB", "app|token")
+        recorder.close()
+        with open(self.path, encoding="utf-8") as f:
+            content = f.read()
+        self.assertNotIn("t0k3n", content)
+        self.assertNotIn("app|token", content)
+
+        client = Client("app_id", "app_secret", "v12.0", transport=RecordReplayTransport(self.path))
+        self.assertEqual(client.inspect_token("t0k3nB", "other")["data"], {"is_valid": False})
+        self.assertEqual(client.inspect_token("t0k3nA", "other")["data"], {"is_valid": True})
+
+    def test_urllib3_transport(self):
+        pool_manager = MagicMock()
+        pool_manager.request.return_value = MagicMock(
+            status=200, headers={"Content-Type": "application/json"}, data=b'{"id": "1"}'
+        )
+        client = Client("app_id", "app_secret", "v12.0", transport=Urllib3Transport(pool_manager), timeout=(3, 9))
+        client.set_access_token("token")
+        self.assertEqual(client.get_account(), {"id": "1"})
+        method, url = pool_manager.request.call_args.args
+        kwargs = pool_manager.request.call_args.kwargs
+        self.assertEqual(method, "GET")
+        self.assertTrue(url.startswith(client.BASE_URL + "/me?access_token=token"))
+        self.assertEqual(kwargs["timeout"].connect_timeout, 3)
+        self.assertEqual(kwargs["timeout"].read_timeout, 9)
+        self.assertFalse(kwargs["retries"])
+
+    @patch("facebookmarketing.transport.requests.request")
+    def test_requests_transport_is_default(self, request):
+        request.return_value = make_response('{"id": "1"}')
+        client = Client("app_id", "app_secret", "v12.0")
+        client.set_access_token("token")
+        self.assertEqual(client.get_account(), {"id": "1"})
+        request.assert_called_once()